@@ -45,6 +45,7 @@ from lib.database import (
     batch_insert_phrase_analyses,
 )
 from lib.storage import upload_audio, delete_storage_folder
+from lib.utils import extract_video_id
 from lib.audio import download_audio, slow_down_audio, create_phrase_audio_clips
 from lib.analysis import (
     transcribe_audio,
@@ -291,23 +292,9 @@ def populate_text_tab(tab, full_text: str, title: str):
             )
 
 
-def _extract_youtube_id(url: str) -> str | None:
-    import re
-    patterns = [
-        r'(?:v=|/v/|youtu\.be/)([a-zA-Z0-9_-]{11})',
-        r'(?:embed/)([a-zA-Z0-9_-]{11})',
-        r'^([a-zA-Z0-9_-]{11})$',
-    ]
-    for p in patterns:
-        m = re.search(p, url)
-        if m:
-            return m.group(1)
-    return None
-
-
 def populate_video_tab(tab, youtube_url: str):
     with tab:
-        vid_id = _extract_youtube_id(youtube_url)
+        vid_id = extract_video_id(youtube_url)
         if vid_id:
             st.components.v1.html(
                 f'<iframe width="100%" height="500" src="https://www.youtube.com/embed/{vid_id}" '
@@ -11,9 +11,15 @@ so it can download from CDNs that block datacenter IPs.
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from lib.utils import extract_video_id
 import json
-import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Non-audio/* types Storage serves audio under; audio/* is matched by prefix
+_AUDIO_CT = frozenset({"application/octet-stream"})
 
 st.set_page_config(page_title="Edge Function Test", page_icon="🧪")
 st.title("🧪 Edge Function YouTube MP3 Test")
@@ -43,6 +49,52 @@ edge_fn_url = f"{supabase_url}/functions/v1/youtube-mp3"
 st.success(f"✅ Supabase URL: `{supabase_url}`")
 st.info(f"🔗 Edge Function URL: `{edge_fn_url}`")
 
+
+@st.cache_resource
+def get_session(anon_key: str) -> requests.Session:
+    """One keep-alive pool for the Supabase project host, kept across reruns."""
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        # Never resend after a read timeout, and never resend a POST on a
+        # 5xx: a slow edge function (e.g. a 504 from the gateway) would be
+        # re-invoked, starting another download job, for each retry
+        read=False,
+        backoff_factor=0.8,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    session.mount("https://", HTTPAdapter(pool_maxsize=8, max_retries=retry))
+    session.headers["Authorization"] = f"Bearer {anon_key}"
+    return session
+
+
+SESSION = get_session(supabase_anon_key)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_public_ip():
+    """Streamlit Cloud's egress IP — stable for the process, so fetch it once an hour."""
+    return requests.get("https://api.ipify.org?format=json", timeout=5).json().get("ip")
+
+
+# Looked up along the exception MRO, so subclasses (ConnectTimeout, ...) resolve too
+_ERROR_MESSAGES = {
+    requests.exceptions.Timeout: "❌ Edge Function timed out",
+    requests.exceptions.SSLError: "❌ TLS handshake with Edge Function failed",
+    requests.exceptions.ConnectionError: "❌ Cannot connect to Edge Function",
+    json.JSONDecodeError: "❌ Edge Function returned a non-JSON body",
+}
+
+
+def describe_error(exc: Exception) -> str:
+    for cls in type(exc).__mro__:
+        if cls in _ERROR_MESSAGES:
+            return _ERROR_MESSAGES[cls]
+    return f"❌ Error: {exc}"
+
+
 # =====================================================================
 # TEST 1: Connectivity test
 # =====================================================================
@@ -50,31 +102,27 @@ st.markdown("---")
 st.markdown("## 1️⃣ Edge Function Connectivity Test")
 
 if st.button("🔍 Test Edge Function", type="secondary"):
-    with st.spinner("Calling edge function..."):
+    with st.spinner("Calling edge function..."), ThreadPoolExecutor(max_workers=1) as pool:
+        # Look up our own egress IP while the edge function call is in flight
+        my_ip_future = pool.submit(get_public_ip)
         try:
-            resp = requests.post(
-                edge_fn_url,
-                json={"action": "test"},
-                headers={
-                    "Authorization": f"Bearer {supabase_anon_key}",
-                    "Content-Type": "application/json",
-                },
-                timeout=30,
-            )
+            resp = SESSION.post(edge_fn_url, json={"action": "test"}, timeout=(5, 30))
             st.write(f"**HTTP Status:** `{resp.status_code}`")
 
             if resp.status_code == 200:
                 data = resp.json()
                 results = data.get("results", {})
                 
-                st.write(f"**Edge Function IP:** `{results.get('edge_ip', 'unknown')}`")
-                st.write(f"**RapidAPI Key:** `{results.get('rapidapi_key_preview', 'not set')}`")
-                st.write(f"**Supabase URL configured:** `{results.get('has_supabase_url', False)}`")
-                st.write(f"**Supabase Service Key configured:** `{results.get('has_supabase_key', False)}`")
+                st.markdown("\n\n".join([
+                    f"**Edge Function IP:** `{results.get('edge_ip', 'unknown')}`",
+                    f"**RapidAPI Key:** `{results.get('rapidapi_key_preview', 'not set')}`",
+                    f"**Supabase URL configured:** `{results.get('has_supabase_url', False)}`",
+                    f"**Supabase Service Key configured:** `{results.get('has_supabase_key', False)}`",
+                ]))
 
                 # Compare IPs
                 try:
-                    my_ip = requests.get("https://api.ipify.org?format=json", timeout=5).json().get("ip")
+                    my_ip = my_ip_future.result()
                     edge_ip = results.get("edge_ip", "")
                     st.write(f"**Streamlit Cloud IP:** `{my_ip}`")
                     if my_ip != edge_ip and edge_ip and "error" not in str(edge_ip):
@@ -106,10 +154,8 @@ if st.button("🔍 Test Edge Function", type="secondary"):
             else:
                 st.error(f"❌ Unexpected response: {resp.status_code}")
                 st.code(resp.text[:500])
-        except requests.exceptions.ConnectionError:
-            st.error("❌ Cannot connect to Edge Function")
         except Exception as e:
-            st.error(f"❌ Error: {e}")
+            st.error(describe_error(e))
 
 # =====================================================================
 # TEST 2: Full download test
@@ -123,17 +169,6 @@ test_url = st.text_input(
 )
 
 
-def extract_video_id(url):
-    for p in [
-        r"(?:v=|/v/|youtu\.be/)([a-zA-Z0-9_-]{11})",
-        r"(?:shorts/)([a-zA-Z0-9_-]{11})",
-    ]:
-        m = re.search(p, url)
-        if m:
-            return m.group(1)
-    return None
-
-
 video_id = extract_video_id(test_url)
 if video_id:
     st.info(f"📹 Video ID: `{video_id}`")
@@ -149,29 +184,26 @@ if st.button("🚀 Download via Edge Function", type="primary"):
     progress.info("⏳ Calling Edge Function... (this may take 15-30 seconds)")
 
     start = time.time()
+    raw = ""
     try:
-        resp = requests.post(
+        resp = SESSION.post(
             edge_fn_url,
             json={"video_id": video_id, "action": "download"},
-            headers={
-                "Authorization": f"Bearer {supabase_anon_key}",
-                "Content-Type": "application/json",
-            },
-            timeout=120,  # Edge function can take a while
+            timeout=(5, 120),  # Edge function can take a while
         )
 
         elapsed = time.time() - start
-        st.write(f"**Response time:** {elapsed:.1f}s")
-        st.write(f"**HTTP Status:** `{resp.status_code}`")
+        st.markdown(f"**Response time:** {elapsed:.1f}s\n\n**HTTP Status:** `{resp.status_code}`")
 
-        data = resp.json()
+        # Decode the body once; the error path below reuses it
+        raw = resp.text
+        data = json.loads(raw)
 
         # Show logs
         logs = data.get("log", [])
         if logs:
             with st.expander("📋 Edge Function Logs", expanded=True):
-                for line in logs:
-                    st.text(line)
+                st.code("\n".join(logs), language=None)
 
         if data.get("status") == "ok":
             url = data.get("url", "")
@@ -184,13 +216,42 @@ if st.button("🚀 Download via Edge Function", type="primary"):
             # Test that we can actually download from storage
             progress.info("⏳ Verifying download from Supabase Storage...")
             try:
-                dl_resp = requests.get(url, stream=True, timeout=15)
-                cl = dl_resp.headers.get("Content-Length", "0")
+                # Re-verifications of the same object only need a 304
+                etag_key = f"etag:{url}"
+                cond = {"If-None-Match": st.session_state[etag_key]} if etag_key in st.session_state else {}
+                dl_resp = SESSION.head(url, headers=cond, timeout=(5, 15), allow_redirects=True)
+                if etag := dl_resp.headers.get("ETag"):
+                    st.session_state[etag_key] = etag
+                content_length = int(cl) if (cl := dl_resp.headers.get("Content-Length")) else None
                 ct = dl_resp.headers.get("Content-Type", "")
+                ct_main = ct.split(";", 1)[0].strip().lower()
+                known_type = ct_main in _AUDIO_CT or ct_main.startswith("audio/") or ct_main == "text/html"
+                status = dl_resp.status_code
+                if status != 304 and content_length is None and not known_type:
+                    # HEAD told us nothing useful — sniff the first KB with a ranged GET
+                    with SESSION.get(
+                        url, headers={"Range": "bytes=0-1023"}, stream=True, timeout=(5, 15),
+                    ) as sniff:
+                        if sniff.status_code == 206:
+                            total = sniff.headers.get("Content-Range", "").rpartition("/")[2]
+                            content_length = int(total) if total.isdigit() else None
+                            status = 200  # the object exists; report it like a full GET
+                        elif sniff.status_code == 200:
+                            # Range ignored: the full body's length is in Content-Length
+                            sniff_cl = sniff.headers.get("Content-Length", "")
+                            content_length = int(sniff_cl) if sniff_cl.isdigit() else None
+                            status = 200
+                        else:
+                            status = sniff.status_code
+                        ct = sniff.headers.get("Content-Type", ct)
+                cl = content_length or 0
                 st.write(
-                    f"**Storage download:** status=`{dl_resp.status_code}` size=`{cl}` type=`{ct}`"
+                    f"**Storage download:** status=`{status}` size=`{cl}` type=`{ct}`"
                 )
-                if dl_resp.status_code == 200 and int(cl or 0) > 10000:
+                if status == 304:
+                    st.success("✅ **Full pipeline verified!** Storage object unchanged since last check (ETag match).")
+                    st.audio(url, format="audio/mpeg")
+                elif status == 200 and cl > 10000:
                     st.success("✅ **Full pipeline verified!** Streamlit can download from Supabase Storage.")
                     st.balloons()
                     
@@ -198,9 +259,8 @@ if st.button("🚀 Download via Edge Function", type="primary"):
                     st.audio(url, format="audio/mpeg")
                 else:
                     st.warning(
-                        f"⚠️ Storage returned {dl_resp.status_code} with {cl} bytes"
+                        f"⚠️ Storage returned {status} with {cl} bytes"
                     )
-                dl_resp.close()
             except Exception as e:
                 st.error(f"Storage download test failed: {e}")
 
@@ -209,16 +269,10 @@ if st.button("🚀 Download via Edge Function", type="primary"):
             error = data.get("error", "Unknown error")
             progress.error(f"❌ {error}")
 
-    except requests.exceptions.Timeout:
-        st.error("❌ Edge Function timed out (>120s)")
-    except requests.exceptions.ConnectionError:
-        st.error("❌ Cannot connect to Edge Function")
     except Exception as e:
-        st.error(f"❌ Error: {e}")
-        try:
-            st.code(resp.text[:500])
-        except:
-            pass
+        st.error(describe_error(e))
+        if raw:
+            st.code(raw[:500])
 
 # =====================================================================
 # Setup instructions
@@ -6,10 +6,14 @@ Modified for Streamlit Cloud: API keys from st.secrets instead of os.getenv.
 
 from __future__ import annotations
 
+import hashlib
 import json
 import re
+import threading
 import time
 import traceback
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
 
 import requests
 import streamlit as st
@@ -23,6 +27,18 @@ try:
 except ImportError:
     FUZZY_MATCHING_AVAILABLE = False
 
+# Faster JSON parsing when available; orjson.JSONDecodeError subclasses
+# json.JSONDecodeError, so the except clauses below cover both
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+# Keep-alive pool for Deepgram so the fallback model call reuses the TLS connection
+_session = requests.Session()
+
 
 # ---------------------------------------------------------------------------
 # Claude client (lazy init)
@@ -41,6 +57,24 @@ def get_claude_client() -> anthropic.Anthropic | None:
     return _claude_client
 
 
+# Parsed-OK analysis replies, keyed by a hash of model + prompt. Lives for the
+# process, so reruns and repeated segments skip the API round-trip.
+_ANALYSIS_CACHE_MAX = 4096
+_analysis_cache: dict[str, str] = {}
+_analysis_cache_lock = threading.Lock()
+
+
+def _analysis_cache_key(model: str, user_msg: str) -> str:
+    return hashlib.blake2b(f"{model}\0{user_msg}".encode(), digest_size=16).hexdigest()
+
+
+def _remember_analysis(key: str, response_text: str) -> None:
+    with _analysis_cache_lock:
+        if key not in _analysis_cache and len(_analysis_cache) >= _ANALYSIS_CACHE_MAX:
+            _analysis_cache.pop(next(iter(_analysis_cache)))
+        _analysis_cache[key] = response_text
+
+
 # ---------------------------------------------------------------------------
 # Deepgram transcription
 # ---------------------------------------------------------------------------
@@ -58,25 +92,26 @@ def transcribe_audio(audio_path: str) -> dict | None:
         "model=nova-2&language=ja&smart_format=true&punctuation=true&utterances=true"
     )
     try:
+        # One handle for both attempts; requests streams it with a Content-Length
         with open(audio_path, "rb") as f:
-            response = requests.post(url, headers=headers, data=f)
-        if response.status_code == 200:
-            return response.json()
-
-        print(f"Deepgram error: {response.status_code} - {response.text[:200]}")
-
-        # Fallback model
-        if "No such model" in response.text or response.status_code == 400:
-            alt_url = (
-                "https://api.deepgram.com/v1/listen?"
-                "model=general&tier=enhanced&language=ja&"
-                "smart_format=true&punctuation=true&utterances=true"
-            )
-            with open(audio_path, "rb") as f:
-                alt_resp = requests.post(alt_url, headers=headers, data=f)
-            if alt_resp.status_code == 200:
-                return alt_resp.json()
-            print(f"Deepgram fallback error: {alt_resp.status_code}")
+            response = _session.post(url, headers=headers, data=f)
+            if response.status_code == 200:
+                return _json_loads(response.content)
+
+            print(f"Deepgram error: {response.status_code} - {response.text[:200]}")
+
+            # Fallback model
+            if "No such model" in response.text or response.status_code == 400:
+                alt_url = (
+                    "https://api.deepgram.com/v1/listen?"
+                    "model=general&tier=enhanced&language=ja&"
+                    "smart_format=true&punctuation=true&utterances=true"
+                )
+                f.seek(0)
+                alt_resp = _session.post(alt_url, headers=headers, data=f)
+                if alt_resp.status_code == 200:
+                    return _json_loads(alt_resp.content)
+                print(f"Deepgram fallback error: {alt_resp.status_code}")
 
         return None
     except Exception as e:
@@ -108,12 +143,14 @@ Example output:
 Return ONLY the JSON array."""
 
 
+_FENCE_RE = re.compile(r"\A```(?:json)?\s*|\s*```\Z")
+
+
 def _strip_json_fences(text: str) -> str:
     """Remove markdown code fences wrapping JSON."""
     text = text.strip()
     if text.startswith("```"):
-        text = re.sub(r"^```(?:json)?\s*", "", text)
-        text = re.sub(r"\s*```$", "", text)
+        text = _FENCE_RE.sub("", text)
     return text.strip()
 
 
@@ -191,15 +228,15 @@ def prepare_japanese_segments(
             grp = all_words[s-1:e]
             if not grp:
                 continue
-            seg_text = "".join(
+            seg_text = "".join([
                 w.get("punctuated_word", w.get("word", "")).strip().replace(" ", "")
                 for w in grp
-            )
+            ])
             segments.append({
                 "start": grp[0]["start"],
                 "end": grp[-1]["end"],
                 "text": seg_text,
-                "words": [dict(w) for w in grp],
+                "words": grp,
             })
 
         debug_info = {
@@ -237,7 +274,7 @@ def _claude_segment(all_words: list[dict]) -> tuple[list[list[int]] | None, str
         )
         raw_text = message.content[0].text
         response_text = _strip_json_fences(raw_text)
-        ranges = json.loads(response_text)
+        ranges = _json_loads(response_text)
 
         if isinstance(ranges, list) and len(ranges) > 0:
             return ranges, raw_text
@@ -251,13 +288,16 @@ def _claude_segment(all_words: list[dict]) -> tuple[list[list[int]] | None, str
         return None, None
 
 
+_SENTENCE_END = frozenset("。？！")
+
+
 def _fallback_segment_ranges(all_words: list[dict]) -> list[list[int]]:
     ranges = []
     start = 1
     for i, w in enumerate(all_words):
         idx = i + 1
         text = w.get("punctuated_word", w.get("word", "")).strip()
-        is_punct = any(p in text for p in "。？！")
+        is_punct = not _SENTENCE_END.isdisjoint(text)
         is_last = idx == len(all_words)
         count = idx - start + 1
         if is_punct or count >= 20 or is_last:
@@ -284,16 +324,14 @@ def extract_words_for_sync(
             return []
 
         adj = 1.0 / speed_factor
-        result = []
-        for w in raw_words:
-            s = w.get("start", 0) * adj
-            e = w.get("end", 0) * adj
-            result.append({
+        return [
+            {
                 "text": w.get("punctuated_word", w.get("word", "")),
-                "start": max(0, s - time_offset),
-                "end": max(0.01, e - time_offset),
-            })
-        return result
+                "start": max(0, w.get("start", 0) * adj - time_offset),
+                "end": max(0.01, w.get("end", 0) * adj - time_offset),
+            }
+            for w in raw_words
+        ]
     except Exception as e:
         print(f"Word sync error: {e}")
         return []
@@ -320,6 +358,8 @@ def extract_phrase_words_for_sync(
         result = []
         for w in raw_words:
             ws = w.get("start", 0)
+            if ws > phrase_end_orig:
+                break  # Deepgram words are in time order; nothing later can fit
             we = w.get("end", 0)
             if ws >= phrase_start_orig and we <= phrase_end_orig:
                 rs = (ws - phrase_start_orig) * adj
@@ -344,7 +384,13 @@ def align_gpt_phrase_to_deepgram_words(
     deepgram_words: list[dict],
     search_start_index: int = 0,
     min_match_score: float = 70,
+    norm_words: list[str] | None = None,
 ) -> tuple[float, float, float, int]:
+    """Locate a Claude phrase in the Deepgram word list.
+
+    ``norm_words`` may carry ``normalize_japanese`` of every word, precomputed
+    once per segment so repeated calls don't re-normalize the same words.
+    """
     if not gpt_phrase_text or not deepgram_words:
         return 0, 0, 0, search_start_index
 
@@ -357,10 +403,24 @@ def align_gpt_phrase_to_deepgram_words(
         last = deepgram_words[-1]
         return last["start"], last["end"], 0, len(deepgram_words)
 
+    if norm_words is None:
+        norm_words = _normalize_words(search_words)
+    else:
+        norm_words = norm_words[search_start_index:]
+
     if FUZZY_MATCHING_AVAILABLE:
-        return _align_fuzzy(norm_phrase, deepgram_words, search_start_index, min_match_score)
+        return _align_fuzzy(
+            norm_phrase, deepgram_words, search_start_index, min_match_score, norm_words,
+        )
     else:
-        return _align_fallback(norm_phrase, deepgram_words, search_start_index)
+        return _align_fallback(norm_phrase, deepgram_words, search_start_index, norm_words)
+
+
+def _normalize_words(words: list[dict]) -> list[str]:
+    return [
+        normalize_japanese(w.get("punctuated_word", w.get("word", "")))
+        for w in words
+    ]
 
 
 def _align_fuzzy(
@@ -368,30 +428,83 @@ def _align_fuzzy(
     all_words: list[dict],
     start_idx: int,
     min_score: float,
+    norm: list[str],
 ) -> tuple[float, float, float, int]:
-    best_score = 0
-    best_si = start_idx
-    best_ei = start_idx
     n = len(all_words)
 
-    for window_size in range(1, n - start_idx + 1):
-        for si in range(start_idx, n - window_size + 1):
-            ei = si + window_size
-            window_words = all_words[si:ei]
-            window_text = "".join(
-                normalize_japanese(w.get("punctuated_word", w.get("word", "")))
-                for w in window_words
+    # Every window is a slice of the joined normalized words
+    joined = "".join(norm)
+    offs = list(accumulate(map(len, norm), initial=0))
+
+    # fuzz.ratio can't exceed 200*min(tlen, wlen)/(tlen + wlen), so a window
+    # whose bound times its length bonus is below min_score can't win.  For
+    # windows longer than the phrase that bound falls below min_score past
+    # max_len (solved from the same inequality); it never does once
+    # 2*tlen >= min_score.  The shortest window only grows with window_size,
+    # so stop once every window is too long.
+    tlen = len(normalized_phrase)
+    if 2 * tlen >= min_score:
+        max_len = float("inf")
+    else:
+        max_len = (200 - min_score) * tlen / (min_score - 2 * tlen)
+
+    # Most phrases appear verbatim. An exact window scores 100 * (1 + 0.01*tlen),
+    # which no other window can match while tlen < 100, so skip the fuzzy scan.
+    if tlen < 100:
+        exact = _exact_window(joined, offs, normalized_phrase)
+        if exact is not None:
+            si, ei = exact
+            return (
+                all_words[start_idx + si]["start"],
+                all_words[start_idx + ei - 1]["end"],
+                100.0 * (1 + 0.01 * tlen),
+                start_idx + ei,
             )
-            if not window_text:
+
+    candidates: list[str] = []
+    spans: list[tuple[int, int]] = []
+    m = len(norm)
+    for window_size in range(1, m + 1):
+        fits = False
+        for si in range(m - window_size + 1):
+            wlen = offs[si + window_size] - offs[si]
+            if wlen > max_len:
+                continue
+            fits = True
+            if not wlen:
                 continue
+            if 200 * min(tlen, wlen) / (tlen + wlen) * (1 + 0.01 * wlen) < min_score - 1e-9:
+                continue
+            candidates.append(joined[offs[si]:offs[si + window_size]])
+            spans.append((start_idx + si, start_idx + si + window_size))
+        if not fits:
+            break
 
-            score = fuzz.ratio(normalized_phrase, window_text)
-            adj_score = score * (1 + 0.01 * len(window_text))
+    best_score = 0
+    best_si = start_idx
+    best_ei = start_idx
 
-            if adj_score > best_score:
-                best_score = adj_score
-                best_si = si
-                best_ei = ei - 1
+    if candidates:
+        # Score every window in one C++ call, then re-rank by length-adjusted score.
+        # A raw score below min_score / (longest bonus) can't reach min_score.
+        # The cutoffs keep a margin for windows whose score * bonus lands on
+        # min_score exactly: dividing back out can round either way, and
+        # process.extract compares score_cutoff with its own rounding (a 1e-6
+        # margin still dropped such windows).  Extra windows let through are
+        # re-ranked on their exact adjusted score and checked against
+        # min_score below, so the margin never changes the result.
+        max_bonus = 1 + 0.01 * max(map(len, candidates))
+        adjusted = [0.0] * len(candidates)
+        for _, score, ci in process.extract(
+            normalized_phrase, candidates, scorer=fuzz.ratio, processor=None, limit=None,
+            score_cutoff=min_score / max_bonus - 1e-3,
+        ):
+            adjusted[ci] = score * (1 + 0.01 * len(candidates[ci]))
+        ci = max(range(len(adjusted)), key=adjusted.__getitem__)
+        if adjusted[ci] > 0:
+            best_score = adjusted[ci]
+            best_si, ei = spans[ci]
+            best_ei = ei - 1
 
     if best_score >= min_score and best_ei < n:
         return (
@@ -409,44 +522,45 @@ def _align_fuzzy(
     )
 
 
+def _exact_window(joined: str, offs: list[int], phrase: str) -> tuple[int, int] | None:
+    """(si, ei) of the fewest-words, earliest whole-word window equal to ``phrase``."""
+    best = None
+    pos = joined.find(phrase)
+    while pos >= 0:
+        si = bisect_right(offs, pos) - 1
+        if offs[si] == pos:
+            end = pos + len(phrase)
+            ei = bisect_left(offs, end, si + 1)
+            if ei < len(offs) and offs[ei] == end and (best is None or ei - si < best[1] - best[0]):
+                best = (si, ei)
+        pos = joined.find(phrase, pos + 1)
+    return best
+
+
 def _align_fallback(
     normalized_phrase: str,
     all_words: list[dict],
     start_idx: int,
+    norm: list[str],
 ) -> tuple[float, float, float, int]:
-    search_words = all_words[start_idx:]
-    full_text = "".join(
-        normalize_japanese(w.get("punctuated_word", w.get("word", "")))
-        for w in search_words
-    )
+    full_text = "".join(norm)
     if not full_text:
         return 0, 0, 0, start_idx
 
     pos = full_text.find(normalized_phrase)
     if pos >= 0:
-        char_start = pos
-        char_end = pos + len(normalized_phrase) - 1
-        start_wi = None
-        end_wi = None
-        cp = 0
-        for i, w in enumerate(search_words):
-            wt = normalize_japanese(w.get("punctuated_word", w.get("word", "")))
-            ncp = cp + len(wt)
-            if start_wi is None and cp <= char_start < ncp:
-                start_wi = i
-            if cp <= char_end < ncp:
-                end_wi = i
-                break
-            cp = ncp
-        if start_wi is not None and end_wi is not None:
-            abs_si = start_idx + start_wi
-            abs_ei = start_idx + end_wi
-            return (
-                all_words[abs_si]["start"],
-                all_words[abs_ei]["end"],
-                100,
-                abs_ei + 1,
-            )
+        # Map char positions to word indices by bisecting cumulative offsets
+        offs = list(accumulate(map(len, norm), initial=0))
+        start_wi = bisect_right(offs, pos) - 1
+        end_wi = bisect_right(offs, pos + len(normalized_phrase) - 1) - 1
+        abs_si = start_idx + start_wi
+        abs_ei = start_idx + end_wi
+        return (
+            all_words[abs_si]["start"],
+            all_words[abs_ei]["end"],
+            100,
+            abs_ei + 1,
+        )
 
     return (
         all_words[start_idx]["start"],
@@ -559,24 +673,32 @@ def analyze_japanese_segment(
         user_msg += f"Previous context (for reference only, do NOT analyze this): {previous_context}\n\n"
     user_msg += f"Analyze this Japanese segment: {segment_text}"
 
+    model = "claude-opus-4-6"
+    cache_key = _analysis_cache_key(model, user_msg)
+
     for attempt in range(max_retries):
         try:
-            message = client.messages.create(
-                model="claude-opus-4-6",
-                max_tokens=4096,
-                messages=[{"role": "user", "content": user_msg}],
-            )
+            with _analysis_cache_lock:
+                response_text = _analysis_cache.get(cache_key)
+            if response_text is None:
+                message = client.messages.create(
+                    model=model,
+                    max_tokens=4096,
+                    messages=[{"role": "user", "content": user_msg}],
+                )
+                response_text = _strip_json_fences(message.content[0].text)
 
-            response_text = _strip_json_fences(message.content[0].text)
-            analysis = json.loads(response_text)
+            analysis = _json_loads(response_text)
 
             if "phrases" in analysis and deepgram_words:
+                norm_words = _normalize_words(deepgram_words)
                 last_word_index = 0
                 for p in analysis["phrases"]:
                     s, e, score, new_idx = align_gpt_phrase_to_deepgram_words(
                         p.get("text", ""),
                         deepgram_words,
                         search_start_index=last_word_index,
+                        norm_words=norm_words,
                     )
                     p["original_start_time"] = s
                     p["original_end_time"] = e
@@ -590,6 +712,10 @@ def analyze_japanese_segment(
                     p["original_end_time"] = segment_start + duration * ((i + 1) / n)
                     p["match_score"] = 0
 
+            # Only replies that produced phrases and aligned cleanly are worth
+            # replaying; anything else must reach the API again on retry
+            if analysis.get("phrases"):
+                _remember_analysis(cache_key, response_text)
             return analysis
 
         except json.JSONDecodeError as e:
@@ -606,6 +732,69 @@ def analyze_japanese_segment(
 # Vocabulary collection
 # ---------------------------------------------------------------------------
 
+_MAX_VOCAB_SPAN = 8
+
+
+def _find_token_span(joined: str, offs: list[int], key: str) -> tuple[int, int] | None:
+    """First run of at most ``_MAX_VOCAB_SPAN`` whole tokens whose text is ``key``."""
+    if not key:
+        return None
+    pos = joined.find(key)
+    while pos >= 0:
+        # A token that normalizes to "" repeats a boundary, so the run can
+        # start at any of the boundaries equal to pos (bisect_left up to
+        # bisect_right) and end at any equal to end (up to bisect_right - 1).
+        # Like the widest n-gram window, prefer the most tokens, then the
+        # latest start, capped at _MAX_VOCAB_SPAN.
+        end = pos + len(key)
+        first = bisect_left(offs, pos)
+        last = bisect_right(offs, end) - 1
+        best = None
+        if offs[first] == pos and offs[last] == end:
+            for i in range(first, bisect_right(offs, pos)):
+                j = min(last, i + _MAX_VOCAB_SPAN)
+                if offs[j] == end and (best is None or j - i >= best[1] - best[0]):
+                    best = (i, j)
+        if best is not None:
+            return best[0], best[1] - 1
+        pos = joined.find(key, pos + 1)
+    return None
+
+
+def _ngram_lookup(toks: list[dict], norm_tok: list[str], off: float) -> dict:
+    n = len(toks)
+    lookup = {}
+    # setdefault: the shortest, earliest occurrence of a repeated key wins and
+    # later duplicates cost a lookup instead of a store
+    for t, key in zip(toks, norm_tok):
+        lookup.setdefault(key, (t["start"] + off, t["end"] + off))
+
+    for span in range(2, min(_MAX_VOCAB_SPAN + 1, n + 1)):
+        for i in range(n - span + 1):
+            key = "".join(norm_tok[i : i + span])
+            if key not in lookup:
+                lookup[key] = (toks[i]["start"] + off, toks[i + span - 1]["end"] + off)
+    return lookup
+
+
+# Below this many candidates a plain fuzz.ratio loop beats extractOne's setup
+_SMALL_FUZZY_POOL = 64
+
+
+def _best_fuzzy_key(k: str, lkeys: list[str], cutoff: float = 90) -> str | None:
+    """First key with the highest fuzz.ratio against ``k``, if it reaches ``cutoff``."""
+    if len(lkeys) > _SMALL_FUZZY_POOL:
+        hit = process.extractOne(k, lkeys, scorer=fuzz.ratio, score_cutoff=cutoff)
+        return hit[0] if hit else None
+    best_key, best = None, 0.0
+    for key in lkeys:
+        # score_cutoff lets the C++ side bail out once a key can't beat the best
+        score = fuzz.ratio(k, key, score_cutoff=max(cutoff, best))
+        if score > best:
+            best_key, best = key, score
+    return best_key
+
+
 def collect_vocab_with_kanji(
     gpt_json: dict,
     vocab_map: dict,
@@ -617,26 +806,17 @@ def collect_vocab_with_kanji(
         return
 
     for phr in gpt_json["phrases"]:
-        lookup = {}
-        if phrase_sync_words:
+        toks = phrase_sync_words or []
+        off = 0.0
+        if toks:
             adj = 1.0 / speed_factor
             off = (phr.get("original_start_time", 0) or 0) * adj - time_offset
-            toks = phrase_sync_words
-            n = len(toks)
-
-            for t in toks:
-                lookup[norm_for_alignment(t["text"])] = (
-                    t["start"] + off,
-                    t["end"] + off,
-                )
-
-            for span in range(2, min(9, n + 1)):
-                for i in range(n - span + 1):
-                    win = toks[i : i + span]
-                    key = norm_for_alignment("".join(t["text"] for t in win))
-                    lookup[key] = (win[0]["start"] + off, win[-1]["end"] + off)
-
-        lkeys = list(lookup.keys())
+        # Normalization is per-character, so any run of tokens normalizes to
+        # the matching slice of the joined view
+        norm_tok = [norm_for_alignment(t["text"]) for t in toks]
+        joined = "".join(norm_tok)
+        offs = list(accumulate(map(len, norm_tok), initial=0))
+        lookup = None  # fuzzy candidates, only built on the first exact miss
 
         for w in phr["words"]:
             if not w.get("kanji"):
@@ -648,11 +828,16 @@ def collect_vocab_with_kanji(
             k = norm_for_alignment(surf)
             start = end = None
 
-            if k in lookup:
-                start, end = lookup[k]
-            elif FUZZY_MATCHING_AVAILABLE and lkeys:
-                hit, score, _ = process.extractOne(k, lkeys, scorer=fuzz.ratio)
-                if score >= 90:
+            span = _find_token_span(joined, offs, k)
+            if span is not None:
+                start = toks[span[0]]["start"] + off
+                end = toks[span[1]]["end"] + off
+            elif FUZZY_MATCHING_AVAILABLE and toks:
+                if lookup is None:
+                    lookup = _ngram_lookup(toks, norm_tok, off)
+                    lkeys = list(lookup)
+                hit = _best_fuzzy_key(k, lkeys)
+                if hit is not None:
                     start, end = lookup[hit]
 
             if start is not None and (end - start) < 0.15:
@@ -14,14 +14,21 @@ Download strategy (in order):
 from __future__ import annotations
 
 import os
+import random
 import re
 import shutil
 import subprocess
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
 from pydub import AudioSegment
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util import Retry
+from lib.utils import extract_video_id as _extract_video_id
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -50,37 +57,100 @@ INVIDIOUS_INSTANCES = [
     "https://inv.nadeko.net",
 ]
 
+# (connect, read) — dead mirrors fail on connect fast instead of eating the read budget
+_PROBE_TIMEOUT = (3, 15)
 
-def _extract_video_id(url: str) -> str | None:
-    """Pull the 11-char YouTube video ID from any common URL format."""
-    patterns = [
-        r"(?:v=|/v/|youtu\.be/)([a-zA-Z0-9_-]{11})",
-        r"(?:embed/)([a-zA-Z0-9_-]{11})",
-        r"(?:shorts/)([a-zA-Z0-9_-]{11})",
-        r"^([a-zA-Z0-9_-]{11})$",
-    ]
-    for p in patterns:
-        m = re.search(p, url)
-        if m:
-            return m.group(1)
-    return None
+# Seconds between hedged mirror probes; see _first_success
+_HEDGE_STAGGER = 0.4
+
+# Read/write size for audio downloads; fewer Python iterations and write() calls
+_DOWNLOAD_CHUNK = 1 << 20
+
+
+def _make_session(max_retries: Retry | int) -> requests.Session:
+    """Keep-alive pool for this module's HTTP calls."""
+    session = requests.Session()
+    # Sized for every Piped probe in flight at once; plain-http mirrors and
+    # proxied stream URLs get the same pooling
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=max_retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    )
+    return session
+
+
+# Downloads, the edge function and oEmbed: retry connect errors and 429/5xx,
+# but never a read timeout, which would turn one slow response (or a 180s
+# stream GET) into several full waits
+_SESSION = _make_session(Retry(
+    total=2,
+    read=False,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    raise_on_status=False,
+))
+
+# Mirror probes: no retries at all.  A dead or erroring mirror should fail
+# within its connect timeout so the hedged probe moves on to the next one.
+_PROBE_SESSION = _make_session(0)
+
+
+_supabase_config: tuple[str, str] | None = None
 
 
 def _get_supabase_config() -> tuple[str, str]:
-    """Get Supabase URL and anon key from Streamlit secrets."""
-    try:
-        return st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"]
-    except Exception:
-        return "", ""
+    """Get Supabase URL and anon key from Streamlit secrets (looked up once)."""
+    global _supabase_config
+    if _supabase_config is None:
+        try:
+            _supabase_config = (st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])
+        except Exception:
+            return "", ""
+    return _supabase_config
+
+
+def _prewarm_connections() -> None:
+    """Open TLS connections to the hosts the first download will hit."""
+    supabase_url, _ = _get_supabase_config()
+    if not supabase_url:
+        return  # edge function disabled; nothing worth warming
+
+    def _warm(url: str) -> None:
+        try:
+            _SESSION.head(url, timeout=5)
+        except Exception:
+            pass
+
+    # The pool keeps the sockets, so the edge-fn POST and oEmbed title skip the handshake
+    for url in (f"{supabase_url.rstrip('/')}/", "https://www.youtube.com/"):
+        threading.Thread(target=_warm, args=(url,), daemon=True).start()
+
+
+_prewarm_connections()
+
+
+# Characters kept in on-disk file names derived from video titles
+_SAFE_TITLE_RE = re.compile(r'[^\w\s\-]')
+
+
+# video_id -> title; only successful lookups are stored so failures retry
+_TITLE_CACHE: dict[str, str] = {}
 
 
 def _fetch_youtube_title(video_id: str) -> str | None:
-    """Fetch YouTube title via oEmbed API (free, no key needed)."""
+    """Fetch YouTube title via oEmbed API (free, no key needed).  Memoized."""
+    if video_id in _TITLE_CACHE:
+        return _TITLE_CACHE[video_id]
     try:
         url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-        resp = requests.get(url, timeout=10)
+        resp = _SESSION.get(url, timeout=10)
         if resp.status_code == 200:
-            return resp.json().get("title")
+            title = resp.json().get("title")
+            if title:
+                _TITLE_CACHE[video_id] = title
+            return title
     except Exception:
         pass
     return None
@@ -112,9 +182,15 @@ def _download_via_edge_function(url: str, output_dir: Path) -> tuple[str | None,
 
     edge_url = f"{supabase_url}/functions/v1/youtube-mp3"
 
+    # The oEmbed title lookup overlaps the (much slower) edge function call;
+    # shutdown(wait=False) lets the failure paths return without waiting on it
+    title_pool = ThreadPoolExecutor(max_workers=1)
+    title_future = title_pool.submit(_fetch_youtube_title, video_id)
+    title_pool.shutdown(wait=False)
+
     try:
         print(f"[edge-fn] Calling edge function for {video_id}...")
-        resp = requests.post(
+        resp = _SESSION.post(
             edge_url,
             json={"video_id": video_id},
             headers={
@@ -141,7 +217,7 @@ def _download_via_edge_function(url: str, output_dir: Path) -> tuple[str | None,
         api_used = data.get("api_used", "unknown")
 
         # Fetch real YouTube title (oEmbed), fall back to edge function response
-        title = _fetch_youtube_title(video_id) or data.get("title", video_id)
+        title = title_future.result() or data.get("title", video_id)
 
         if not storage_url:
             print("[edge-fn] No storage URL in response")
@@ -151,15 +227,16 @@ def _download_via_edge_function(url: str, output_dir: Path) -> tuple[str | None,
         print(f"[edge-fn] Title: {title}")
 
         # Download from Supabase Storage to local file
-        safe_title = re.sub(r'[^\w\s\-]', '', title)[:80].strip() or "audio"
+        safe_title = _SAFE_TITLE_RE.sub('', title)[:80].strip() or "audio"
         mp3_path = output_dir / f"{safe_title}.mp3"
 
         print(f"[edge-fn] Downloading from Supabase Storage...")
-        dl_resp = requests.get(storage_url, timeout=60)
-        dl_resp.raise_for_status()
-
-        with open(mp3_path, "wb") as f:
-            f.write(dl_resp.content)
+        with _SESSION.get(storage_url, stream=True, timeout=60) as dl_resp:
+            dl_resp.raise_for_status()
+            # copyfileobj moves the body in C-sized reads without requests' iterator layer
+            dl_resp.raw.decode_content = True
+            with open(mp3_path, "wb") as f:
+                shutil.copyfileobj(dl_resp.raw, f, length=_DOWNLOAD_CHUNK)
 
         file_size = mp3_path.stat().st_size
         print(f"[edge-fn] Saved {file_size / 1024 / 1024:.2f} MB to {mp3_path.name}")
@@ -183,39 +260,227 @@ def _download_via_edge_function(url: str, output_dir: Path) -> tuple[str | None,
 # Method 2: Piped API (free, but unreliable — most instances dead)
 # ---------------------------------------------------------------------------
 
-def _download_via_piped(url: str, output_dir: Path) -> tuple[str | None, str | None]:
-    """Download audio via Piped API proxy."""
+def _first_success(instances: list[str], probe, *args, stagger: float = _HEDGE_STAGGER):
+    """Hedged ``probe(instance, *args)`` across ``instances``; first truthy result wins.
+
+    The first instance is tried immediately and another joins every ``stagger``
+    seconds, or as soon as an in-flight probe fails, so a healthy mirror near the
+    top of the list answers alone while dead ones cost at most ``stagger`` each.
+    """
+    queue = list(instances)
+    ex = ThreadPoolExecutor(max_workers=max(1, len(queue)))
+    pending: set = set()
+    try:
+        while queue or pending:
+            if queue:
+                pending.add(ex.submit(probe, queue.pop(0), *args))
+            done, pending = wait(
+                pending, timeout=stagger if queue else None, return_when=FIRST_COMPLETED,
+            )
+            for fut in done:
+                result = fut.result()
+                if result:
+                    return result
+        return None
+    finally:
+        # Don't wait on slower (or dead) instances once one has answered
+        ex.shutdown(wait=False, cancel_futures=True)
+
+
+# Liveness of each mirror list, re-checked every _LIVE_TTL seconds:
+# name -> (checked_at, live instances).  Checks run in the background so
+# stream probing never waits on them.
+_LIVE_TTL = 600
+_LIVE_INSTANCES: dict[str, tuple[float, list[str]]] = {}
+_LIVE_REFRESHING: set[str] = set()
+_LIVE_LOCK = threading.Lock()
+
+
+def _is_reachable(instance: str) -> bool:
+    try:
+        # Any HTTP answer means the host is up; dead mirrors fail to connect
+        return _PROBE_SESSION.head(f"{instance.rstrip('/')}/", timeout=3).status_code < 500
+    except Exception:
+        return False
+
+
+def _refresh_live_instances(name: str, instances: list[str]) -> None:
+    try:
+        with ThreadPoolExecutor(max_workers=len(instances)) as ex:
+            live = [inst for inst, ok in zip(instances, ex.map(_is_reachable, instances)) if ok]
+        print(f"[{name}] {len(live)}/{len(instances)} instances reachable")
+        # If nothing answered, the problem is probably on our side; keep trying them all
+        with _LIVE_LOCK:
+            _LIVE_INSTANCES[name] = (time.time(), live or instances)
+    finally:
+        with _LIVE_LOCK:
+            _LIVE_REFRESHING.discard(name)
+
+
+def _live_instances(name: str, instances: list[str]) -> list[str]:
+    """The subset of ``instances`` that answered a HEAD probe recently.
+
+    Until the first check finishes this is the full list; a stale result is
+    served while a new check runs.
+    """
+    with _LIVE_LOCK:
+        cached = _LIVE_INSTANCES.get(name)
+        stale = cached is None or time.time() - cached[0] >= _LIVE_TTL
+        if stale and name not in _LIVE_REFRESHING:
+            _LIVE_REFRESHING.add(name)
+            threading.Thread(
+                target=_refresh_live_instances, args=(name, instances), daemon=True,
+            ).start()
+    return cached[1] if cached else instances
+
+
+# Circuit breaker per mirror: after _BREAKER_THRESHOLD consecutive failures an
+# instance is skipped for _BREAKER_COOLDOWN seconds, then gets one trial probe
+_BREAKER_THRESHOLD = 3
+_BREAKER_COOLDOWN = 60
+_BREAKERS: dict[str, dict] = {}
+_BREAKER_LOCK = threading.Lock()
+
+
+def _breaker_allows(instance: str) -> bool:
+    with _BREAKER_LOCK:
+        b = _BREAKERS.get(instance)
+        if b is None or b["state"] == "closed":
+            return True
+        if b["state"] == "open" and time.time() >= b["open_until"]:
+            b["state"] = "half-open"  # let exactly one probe through
+            return True
+        return False
+
+
+def _breaker_record(instance: str, ok: bool) -> None:
+    with _BREAKER_LOCK:
+        b = _BREAKERS.setdefault(instance, {"state": "closed", "fails": 0, "open_until": 0.0})
+        if ok:
+            b.update(state="closed", fails=0)
+            return
+        b["fails"] += 1
+        if b["state"] == "half-open" or b["fails"] >= _BREAKER_THRESHOLD:
+            b["state"] = "open"
+            b["open_until"] = time.time() + _BREAKER_COOLDOWN
+
+
+def _probe_piped_instance(instance: str, video_id: str) -> dict | None:
+    """Fetch stream metadata from one Piped instance; None unless it lists audio."""
+    if not _breaker_allows(instance):
+        print(f"[piped] Skipping {instance} (circuit open)")
+        return None
+    data, healthy = _fetch_piped_streams(instance, video_id)
+    _breaker_record(instance, healthy)
+    return data
+
+
+def _fetch_piped_streams(instance: str, video_id: str) -> tuple[dict | None, bool]:
+    """(stream data or None, whether the instance itself is healthy).
+
+    Only connection errors, timeouts and 5xx count against the instance; a 4xx
+    or a video without audio streams is about the video, not the mirror.
+    """
+    api_url = f"{instance.rstrip('/')}/streams/{video_id}"
+    try:
+        print(f"[piped] Trying {instance}...")
+        # Stream so error pages are never downloaded; only a 200 body is read
+        resp = _PROBE_SESSION.get(api_url, timeout=_PROBE_TIMEOUT, stream=True)
+        if resp.status_code != 200:
+            resp.close()
+            print(f"[piped] {instance} returned HTTP {resp.status_code}")
+            return None, resp.status_code < 500
+        data = resp.json()
+        if data.get("audioStreams"):
+            print(f"[piped] Got {len(data['audioStreams'])} audio streams from {instance}")
+            return data, True
+        print(f"[piped] {instance} returned no audio streams")
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        print(f"[piped] {instance} error: {e}")
+        return None, False
+    except Exception as e:
+        print(f"[piped] {instance} error: {e}")
+    return None, True
+
+
+# Selected streams per (provider, video_id): (expires_at, (stream_url, title,
+# mime_type)).  Mirror stream URLs are signed and expire, so entries only live a
+# few minutes.  Lookups in flight are shared, so concurrent downloads of the same
+# video wait on one round of probes instead of each running their own.
+_STREAM_TTL = 300
+_STREAM_CACHE: dict[tuple[str, str], tuple[float, tuple[str, str, str]]] = {}
+_STREAM_INFLIGHT: dict[tuple[str, str], Future] = {}
+_STREAM_LOCK = threading.Lock()
+
+
+def _resolve_stream(provider: str, video_id: str, lookup) -> tuple[tuple[str, str, str] | None, bool]:
+    """``lookup(video_id)`` memoized per provider; returns (stream, came_from_cache)."""
+    key = (provider, video_id)
+    with _STREAM_LOCK:
+        now = time.time()
+        for k in [k for k, entry in _STREAM_CACHE.items() if entry[0] <= now]:
+            del _STREAM_CACHE[k]
+        entry = _STREAM_CACHE.get(key)
+        if entry:
+            return entry[1], True
+        fut = _STREAM_INFLIGHT.get(key)
+        owner = fut is None
+        if owner:
+            fut = _STREAM_INFLIGHT[key] = Future()
+    if not owner:
+        return fut.result(), False
+
+    try:
+        picked = lookup(video_id)
+    except BaseException as e:
+        with _STREAM_LOCK:
+            _STREAM_INFLIGHT.pop(key, None)
+        fut.set_exception(e)
+        raise
+    with _STREAM_LOCK:
+        _STREAM_INFLIGHT.pop(key, None)
+        if picked:
+            _STREAM_CACHE[key] = (time.time() + _STREAM_TTL, picked)
+    fut.set_result(picked)
+    return picked, False
+
+
+def _download_cached_stream(
+    provider: str, url: str, output_dir: Path, lookup,
+) -> tuple[str | None, str | None]:
+    """Resolve a stream through the cache and download it as MP3."""
     video_id = _extract_video_id(url)
     if not video_id:
-        print("[piped] Could not extract video ID")
+        print(f"[{provider}] Could not extract video ID")
         return None, None
 
-    stream_data = None
-    for instance in PIPED_INSTANCES:
-        base = instance.rstrip("/")
-        api_url = f"{base}/streams/{video_id}"
-        try:
-            print(f"[piped] Trying {instance}...")
-            resp = requests.get(api_url, timeout=15, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            })
-            if resp.status_code == 200:
-                data = resp.json()
-                if data.get("audioStreams"):
-                    stream_data = data
-                    print(f"[piped] Got {len(data['audioStreams'])} audio streams from {instance}")
-                    break
-                else:
-                    print(f"[piped] {instance} returned no audio streams")
-            else:
-                print(f"[piped] {instance} returned HTTP {resp.status_code}")
-        except Exception as e:
-            print(f"[piped] {instance} error: {e}")
-            continue
+    while True:
+        picked, cached = _resolve_stream(provider, video_id, lookup)
+        if not picked:
+            return None, None
+        stream_url, title, mime_type = picked
+        if cached:
+            print(f"[{provider}] Reusing stream selected earlier | {mime_type}")
+        filepath, title = _download_and_convert(stream_url, title, mime_type, output_dir, provider)
+        if filepath:
+            return filepath, title
+        # Usually the signed URL expired (403/410): drop it so the next lookup
+        # probes again, and retry once here if the stale entry was ours
+        with _STREAM_LOCK:
+            _STREAM_CACHE.pop((provider, video_id), None)
+        if not cached:
+            return None, None
+
+
+def _pick_piped_stream(video_id: str) -> tuple[str, str, str] | None:
+    """Best audio stream from the first Piped instance that answers: (url, title, mime)."""
+    stream_data = _first_success(
+        _live_instances("piped", PIPED_INSTANCES), _probe_piped_instance, video_id,
+    )
 
     if not stream_data or not stream_data.get("audioStreams"):
         print("[piped] All Piped instances failed")
-        return None, None
+        return None
 
     title = stream_data.get("title", "video")
     audio_streams = stream_data["audioStreams"]
@@ -230,77 +495,160 @@ def _download_via_piped(url: str, output_dir: Path) -> tuple[str | None, str | N
     print(f"[piped] Selected: {best.get('quality', '?')} | {mime_type}")
 
     if not stream_url:
-        return None, None
+        return None
+    return stream_url, title, mime_type
 
-    return _download_and_convert(stream_url, title, mime_type, output_dir, "piped")
+
+def _download_via_piped(url: str, output_dir: Path) -> tuple[str | None, str | None]:
+    """Download audio via Piped API proxy."""
+    return _download_cached_stream("piped", url, output_dir, _pick_piped_stream)
 
 
 # ---------------------------------------------------------------------------
 # Method 3: Invidious API (free, unreliable)
 # ---------------------------------------------------------------------------
 
+def _probe_invidious_instance(instance: str, video_id: str) -> tuple[str, str, str] | None:
+    """Pick an audio format from one Invidious instance: (url, title, mime) or None."""
+    base = instance.rstrip("/")
+    api_url = f"{base}/api/v1/videos/{video_id}?local=true"
+    try:
+        print(f"[invidious] Trying {instance}...")
+        # Stream so error pages are never downloaded; only a 200 body is read
+        resp = _PROBE_SESSION.get(api_url, timeout=_PROBE_TIMEOUT, stream=True)
+        if resp.status_code != 200:
+            resp.close()
+            print(f"[invidious] {instance} returned HTTP {resp.status_code}")
+            return None
+        data = resp.json()
+        title = data.get("title", "video")
+        adaptive = data.get("adaptiveFormats", [])
+        audio_formats = [f for f in adaptive if f.get("type", "").startswith("audio/")]
+
+        if not audio_formats:
+            print(f"[invidious] {instance} returned no audio formats")
+            return None
+
+        best_format = None
+        for itag in [251, 140, 250, 249]:
+            for f in audio_formats:
+                if str(f.get("itag")) == str(itag):
+                    best_format = f
+                    break
+            if best_format:
+                break
+        if not best_format:
+            audio_formats.sort(
+                key=lambda f: int(f.get("bitrate", 0) if not isinstance(f.get("bitrate"), str) else f.get("bitrate", "0")),
+                reverse=True,
+            )
+            best_format = audio_formats[0]
+
+        fmt_url = best_format.get("url")
+        if not fmt_url:
+            return None
+        if fmt_url.startswith("/"):
+            fmt_url = f"{base}{fmt_url}"
+
+        mime_type = best_format.get("type", "audio/mp4").split(";")[0]
+        print(f"[invidious] Selected: itag={best_format.get('itag')} | {mime_type}")
+        return fmt_url, title, mime_type
+    except Exception as e:
+        print(f"[invidious] {instance} error: {e}")
+        return None
+
+
+def _pick_invidious_stream(video_id: str) -> tuple[str, str, str] | None:
+    """Audio format from the first Invidious instance that answers: (url, title, mime)."""
+    picked = _first_success(
+        _live_instances("invidious", INVIDIOUS_INSTANCES), _probe_invidious_instance, video_id,
+    )
+    if not picked:
+        print("[invidious] All Invidious instances failed")
+    return picked
+
+
 def _download_via_invidious(url: str, output_dir: Path) -> tuple[str | None, str | None]:
     """Download audio via Invidious API with ?local=true for proxied streams."""
-    video_id = _extract_video_id(url)
-    if not video_id:
-        return None, None
-
-    for instance in INVIDIOUS_INSTANCES:
-        base = instance.rstrip("/")
-        api_url = f"{base}/api/v1/videos/{video_id}?local=true"
-        try:
-            print(f"[invidious] Trying {instance}...")
-            resp = requests.get(api_url, timeout=15, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            })
-            if resp.status_code == 200:
-                data = resp.json()
-                title = data.get("title", "video")
-                adaptive = data.get("adaptiveFormats", [])
-                audio_formats = [f for f in adaptive if f.get("type", "").startswith("audio/")]
-
-                if not audio_formats:
-                    print(f"[invidious] {instance} returned no audio formats")
-                    continue
-
-                best_format = None
-                for itag in [251, 140, 250, 249]:
-                    for f in audio_formats:
-                        if str(f.get("itag")) == str(itag):
-                            best_format = f
-                            break
-                    if best_format:
-                        break
-                if not best_format:
-                    audio_formats.sort(
-                        key=lambda f: int(f.get("bitrate", 0) if not isinstance(f.get("bitrate"), str) else f.get("bitrate", "0")),
-                        reverse=True,
-                    )
-                    best_format = audio_formats[0]
-
-                fmt_url = best_format.get("url")
-                if not fmt_url:
-                    continue
-                if fmt_url.startswith("/"):
-                    fmt_url = f"{base}{fmt_url}"
-
-                mime_type = best_format.get("type", "audio/mp4").split(";")[0]
-                print(f"[invidious] Selected: itag={best_format.get('itag')} | {mime_type}")
-                return _download_and_convert(fmt_url, title, mime_type, output_dir, "invidious")
-            else:
-                print(f"[invidious] {instance} returned HTTP {resp.status_code}")
-        except Exception as e:
-            print(f"[invidious] {instance} error: {e}")
-            continue
-
-    print("[invidious] All Invidious instances failed")
-    return None, None
+    return _download_cached_stream("invidious", url, output_dir, _pick_invidious_stream)
 
 
 # ---------------------------------------------------------------------------
 # Shared download + convert helper
 # ---------------------------------------------------------------------------
 
+# Dropped connections mid-body are resumed with a Range request this many times
+_STREAM_RETRIES = 3
+
+
+def _copy_stream(url: str, dst, source: str) -> int:
+    """Copy ``url``'s body into ``dst``, resuming after dropped connections.
+
+    Returns the number of bytes written.  HTTP errors (4xx/5xx) are not retried.
+    """
+    written = 0
+    attempt = 0
+    while True:
+        headers = {"Range": f"bytes={written}-"} if written else None
+        try:
+            with _SESSION.get(url, stream=True, timeout=180, headers=headers) as r:
+                r.raise_for_status()
+                if written and r.status_code != 206:
+                    raise RuntimeError("server ignored Range; cannot resume")
+                r.raw.decode_content = True
+                while chunk := r.raw.read(_DOWNLOAD_CHUNK):
+                    dst.write(chunk)
+                    written += len(chunk)
+            return written
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+            Urllib3Error,
+        ) as e:
+            if attempt >= _STREAM_RETRIES:
+                raise
+            # Exponential backoff with jitter so parallel downloads don't retry in lockstep
+            delay = min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            print(f"[{source}] Stream dropped at {written} bytes ({e}); resuming in {delay:.1f}s")
+            time.sleep(delay)
+
+
+_MP3_ENCODE = ["-acodec", "libmp3lame", "-ab", "192k", "-ar", "44100", "-threads", "0"]
+
+
+def _mp3_codec_args(mime_type: str) -> list[str]:
+    """Remux streams that are already MP3; everything else goes through LAME."""
+    if "mpeg" in mime_type or "mp3" in mime_type:
+        return ["-c:a", "copy"]
+    return _MP3_ENCODE
+
+
+def _stream_to_mp3(stream_url: str, mp3_path: Path, source: str, codec: list[str]) -> bool:
+    """Pipe the HTTP body straight into ffmpeg so encoding overlaps the download."""
+    # stderr is discarded: nothing drains it while we write stdin, so a PIPE
+    # could fill up and stall ffmpeg
+    proc = subprocess.Popen(
+        ["ffmpeg", "-y", "-i", "pipe:0", "-vn", *codec, str(mp3_path)],
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        print(f"[{source}] Streaming audio into ffmpeg...")
+        _copy_stream(stream_url, proc.stdin, source)
+        proc.stdin.close()
+        proc.wait(timeout=120)
+    except Exception as e:
+        # e.g. BrokenPipeError when ffmpeg can't demux from a pipe (moov-at-end MP4)
+        print(f"[{source}] Streamed conversion failed: {e}")
+        proc.kill()
+        proc.wait()
+
+    if proc.returncode == 0 and mp3_path.exists() and mp3_path.stat().st_size > 1000:
+        return True
+    mp3_path.unlink(missing_ok=True)
+    return False
+
+
 def _download_and_convert(
     stream_url: str, title: str, mime_type: str, output_dir: Path, source: str,
 ) -> tuple[str | None, str | None]:
@@ -310,22 +658,22 @@ def _download_and_convert(
         ext = "webm"
     elif "ogg" in mime_type:
         ext = "ogg"
+    elif "mpeg" in mime_type or "mp3" in mime_type:
+        ext = "mpga"  # keep clear of the .mp3 output name
+    codec = _mp3_codec_args(mime_type)
 
-    safe_title = re.sub(r'[^\w\s\-]', '', title)[:80].strip() or "audio"
+    safe_title = _SAFE_TITLE_RE.sub('', title)[:80].strip() or "audio"
     raw_path = output_dir / f"{safe_title}.{ext}"
     mp3_path = output_dir / f"{safe_title}.mp3"
 
+    if _stream_to_mp3(stream_url, mp3_path, source, codec):
+        return str(mp3_path), title
+
+    # Not every container demuxes from a pipe; retry via a file on disk
     try:
         print(f"[{source}] Downloading audio stream...")
-        with requests.get(stream_url, stream=True, timeout=180, headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }) as r:
-            r.raise_for_status()
-            total = 0
-            with open(raw_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=65536):
-                    f.write(chunk)
-                    total += len(chunk)
+        with open(raw_path, "wb", buffering=_DOWNLOAD_CHUNK) as f:
+            total = _copy_stream(stream_url, f, source)
         print(f"[{source}] Downloaded {total / 1024 / 1024:.1f} MB")
     except Exception as e:
         print(f"[{source}] Download error: {e}")
@@ -339,12 +687,18 @@ def _download_and_convert(
 
     try:
         print(f"[{source}] Converting to MP3...")
-        result = subprocess.run(
-            ["ffmpeg", "-y", "-i", str(raw_path), "-vn",
-             "-acodec", "libmp3lame", "-ab", "192k", "-ar", "44100",
-             str(mp3_path)],
-            capture_output=True, text=True, timeout=120,
-        )
+        # Second attempt tolerates corrupt frames and missing timestamps, the
+        # usual reasons a proxied stream fails to convert; it always re-encodes
+        # so a stream-copy that choked on bad frames gets a clean retry
+        lenient = ["-err_detect", "ignore_err", "-fflags", "+genpts+discardcorrupt"]
+        for input_flags, codec_args in (([], codec), (lenient, _MP3_ENCODE)):
+            result = subprocess.run(
+                ["ffmpeg", "-y", *input_flags, "-i", str(raw_path), "-vn", *codec_args,
+                 str(mp3_path)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=120,
+            )
+            if result.returncode == 0:
+                break
         if result.returncode != 0:
             try:
                 audio = AudioSegment.from_file(str(raw_path))
@@ -387,10 +741,15 @@ def _download_via_ytdlp(url: str, output_dir: Path) -> tuple[str | None, str | N
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
             title = info.get("title", "video")
-            mp3_files = list(output_dir.glob("*.mp3"))
-            if not mp3_files:
+            # yt-dlp reports the post-processed path; older versions don't, so
+            # fall back to the outtmpl name with FFmpegExtractAudio's extension
+            downloads = info.get("requested_downloads") or [{}]
+            filepath = Path(
+                downloads[0].get("filepath")
+                or Path(ydl.prepare_filename(info)).with_suffix(".mp3")
+            )
+            if not filepath.exists():
                 return None, None
-            filepath = max(mp3_files, key=os.path.getctime)
             return str(filepath), title
     except Exception as e:
         print(f"[yt-dlp] Download error: {e}")
@@ -448,6 +807,17 @@ def download_audio(url: str, output_dir: Path) -> tuple[str | None, str | None]:
 # Audio processing utilities (unchanged)
 # ---------------------------------------------------------------------------
 
+def _atempo_chain(speed_factor: float) -> str:
+    """ffmpeg atempo filter chain; each stage only accepts 0.5-2.0, so chain them."""
+    filters = []
+    remaining = speed_factor
+    while remaining < 0.5:
+        filters.append("atempo=0.5")
+        remaining /= 0.5
+    filters.append(f"atempo={remaining}")
+    return ",".join(filters)
+
+
 def slow_down_audio(
     input_path: str, output_path: str, speed_factor: float = 0.75
 ) -> str | None:
@@ -457,18 +827,21 @@ def slow_down_audio(
         out = Path(output_path)
         out.parent.mkdir(parents=True, exist_ok=True)
 
-        filters = []
-        remaining = speed_factor
-        while remaining < 0.5:
-            filters.append("atempo=0.5")
-            remaining /= 0.5
-        filters.append(f"atempo={remaining}")
-        filter_str = ",".join(filters)
-
-        audio = AudioSegment.from_file(str(inp))
-        temp_path = out.parent / f"_temp_{out.name}"
-        audio.export(str(temp_path), format="mp3", parameters=["-filter:a", filter_str])
-        os.rename(str(temp_path), str(out))
+        filter_str = _atempo_chain(speed_factor)
+
+        # One ffmpeg decode -> atempo -> encode pass; no PCM round-trip through pydub.
+        # Written in place: on failure the copy fallback below overwrites it.
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-i", str(inp), "-vn", "-filter:a", filter_str,
+             "-acodec", "libmp3lame", "-ab", "192k", "-ar", "44100", "-threads", "0",
+             str(out)],
+            # No timeout: encoding a long video's full track can legitimately
+            # take minutes, and a timeout here would upload the unslowed copy
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        if result.returncode != 0:
+            err = result.stderr[-300:].decode(errors="replace")
+            raise RuntimeError(f"ffmpeg exited {result.returncode}: {err}")
         return str(out)
     except Exception as e:
         print(f"Slow down error: {e}")
@@ -478,6 +851,35 @@ def slow_down_audio(
         return None
 
 
+# Shared by every create_phrase_audio_clips call: jp.py processes several
+# segments at once, and a pool per call would multiply the ffmpeg processes
+_CLIP_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+
+def _slice_and_slow(
+    original: str, start_s: float, end_s: float, out_path: str, filter_str: str,
+) -> bool:
+    """Cut ``start_s..end_s`` from ``original`` and apply ``filter_str`` in one ffmpeg pass."""
+    # -ss and -t before -i seek and bound the *input*; as output options, -t
+    # would cap the clip after atempo has stretched it and cut off its tail
+    cut = ["ffmpeg", "-y", "-ss", f"{start_s:.3f}", "-t", f"{end_s - start_s:.3f}",
+           "-i", original, "-vn"]
+    # One thread each: _CLIP_POOL runs cpu_count of these at a time across all
+    # segments, so more would oversubscribe
+    encode = ["-acodec", "libmp3lame", "-ab", "192k", "-ar", "44100", "-threads", "1", out_path]
+    # Without the filter as a last resort, like slow_down_audio's copy fallback
+    for filt in (["-filter:a", filter_str], []):
+        result = subprocess.run(
+            cut + filt + encode,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=120,
+        )
+        # A cut past the end of the audio yields a header-only file
+        if result.returncode == 0 and os.path.exists(out_path) and os.path.getsize(out_path) > 1000:
+            return True
+    Path(out_path).unlink(missing_ok=True)
+    return False
+
+
 def create_phrase_audio_clips(
     original_audio_path: str,
     phrases_with_timings: list[tuple[float, float]],
@@ -492,34 +894,30 @@ def create_phrase_audio_clips(
 
     try:
         output_dir.mkdir(parents=True, exist_ok=True)
-        main_audio = AudioSegment.from_mp3(original_audio_path)
 
+        jobs: list[tuple[int, float, float, Path]] = []
         for i, (start_s, end_s) in enumerate(phrases_with_timings):
-            start_ms = int(start_s * 1000)
-            end_ms = int(end_s * 1000)
-            start_ms = max(0, start_ms - 50)
-            end_ms = min(len(main_audio), end_ms + 50)
-
+            start_ms = max(0, int(start_s * 1000) - 50)
+            end_ms = int(end_s * 1000) + 50
+            result[i] = None
             if start_ms >= end_ms:
-                result[i] = None
                 continue
+            final_fp = output_dir / f"phrase_S{segment_id}_P{i}.mp3"
+            jobs.append((i, start_ms / 1000, end_ms / 1000, final_fp))
 
-            clip = main_audio[start_ms:end_ms]
-            temp_fn = f"_temp_S{segment_id}_P{i}.mp3"
-            temp_fp = output_dir / temp_fn
-            clip.export(str(temp_fp), format="mp3")
-
-            final_fn = f"phrase_S{segment_id}_P{i}.mp3"
-            final_fp = output_dir / final_fn
-            slowed = slow_down_audio(str(temp_fp), str(final_fp), speed_factor)
-            result[i] = final_fn if slowed else None
+        # speed_factor is the same for every phrase
+        filter_str = _atempo_chain(speed_factor)
 
-            try:
-                os.remove(str(temp_fp))
-            except OSError:
-                pass
+        # Each job is an ffmpeg subprocess on the shared _CLIP_POOL, which caps
+        # encodes at cpu_count across every segment jp.py is processing
+        futures = [
+            _CLIP_POOL.submit(_slice_and_slow, original_audio_path, start, end, str(final_fp), filter_str)
+            for _, start, end, final_fp in jobs
+        ]
+        for (i, _, _, final_fp), fut in zip(jobs, futures):
+            result[i] = final_fp.name if fut.result() else None
 
         return result
     except Exception as e:
         print(f"Phrase audio error S{segment_id}: {e}")
-        return {i: None for i in range(len(phrases_with_timings))}
\ No newline at end of file
+        return {i: None for i in range(len(phrases_with_timings))}
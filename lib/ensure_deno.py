@@ -11,6 +11,8 @@ import stat
 import zipfile
 import io
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 DENO_DIR = os.path.expanduser("~/.deno/bin")
 DENO_PATH = os.path.join(DENO_DIR, "deno")
@@ -49,8 +51,13 @@ def install_deno() -> bool:
     url = f"https://github.com/denoland/deno/releases/latest/download/deno-{target}.zip"
     print(f"[deno] Downloading from {url} ...")
 
+    # GitHub's release CDN occasionally answers 5xx; retry those instead of
+    # leaving yt-dlp without a JS runtime for the whole process
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
     try:
-        resp = requests.get(url, timeout=60)
+        with requests.Session() as session:
+            session.mount("https://", HTTPAdapter(max_retries=retry))
+            resp = session.get(url, timeout=60)
         resp.raise_for_status()
     except Exception as e:
         print(f"[deno] Download failed: {e}")
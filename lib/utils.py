@@ -1,23 +1,40 @@
 # lib/utils.py
 """Shared utility functions with memoization."""
 
+from __future__ import annotations
+
 import re
 from functools import lru_cache
 
 
-@lru_cache(maxsize=4096)
+_STRIP_RE = re.compile(r'[「」『』（）\(\)\s\u3000]')
+
+
+@lru_cache(maxsize=16384)
 def normalize_japanese(text: str) -> str:
     """Remove brackets, spaces, normalize Japanese text. Memoized."""
     if not text:
         return ""
-    return re.sub(r'[「」『』（）\(\)\s\u3000]', '', text).strip()
+    return _STRIP_RE.sub('', text).strip()
 
 
 # Full-width to half-width digit translation table
 _FULL2HALF = str.maketrans("０１２３４５６７８９", "0123456789")
 
 
-@lru_cache(maxsize=4096)
+@lru_cache(maxsize=16384)
 def norm_for_alignment(text: str) -> str:
     """Normalize text for alignment: remove brackets, spaces, convert digits."""
     return normalize_japanese(text).translate(_FULL2HALF)
+
+
+_VIDEO_ID_RE = re.compile(
+    r"(?:v=|/v/|youtu\.be/|embed/|shorts/)([a-zA-Z0-9_-]{11})|^([a-zA-Z0-9_-]{11})$"
+)
+
+
+@lru_cache(maxsize=128)
+def extract_video_id(url: str) -> str | None:
+    """Pull the 11-char YouTube video ID from any common URL format. Memoized."""
+    m = _VIDEO_ID_RE.search(url)
+    return (m.group(1) or m.group(2)) if m else None